@@ -2,3 +2,10 @@ class ServerConfiguration:
     SERVER_PORT = 8000
     SERVER_HOST = "0.0.0.0"
     LOG_LEVEL = "DEBUG"
+
+
+class HttpClientConfiguration:
+    CONNECTION_LIMIT = 100  # Open connections across every upload sharing the session
+    CONNECTION_LIMIT_PER_HOST = 10
+    DNS_CACHE_TTL_SECONDS = 300
+    DEFAULT_HEADERS = {"User-Agent": "firefly-essays-client/1.0"}
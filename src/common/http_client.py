@@ -0,0 +1,34 @@
+import aiohttp
+
+from src.common.constants import HttpClientConfiguration
+
+_session = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it lazily on first use.
+
+    Reusing a single session keeps the connection pool (keep-alive connections and
+    DNS cache) warm across batches and requests.
+
+    Returns:
+        ClientSession: The shared session object for making HTTP requests.
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HttpClientConfiguration.CONNECTION_LIMIT,
+            limit_per_host=HttpClientConfiguration.CONNECTION_LIMIT_PER_HOST,
+            ttl_dns_cache=HttpClientConfiguration.DNS_CACHE_TTL_SECONDS,
+            enable_cleanup_closed=True
+        )
+        _session = aiohttp.ClientSession(connector=connector, headers=HttpClientConfiguration.DEFAULT_HEADERS)
+    return _session
+
+
+async def close_session() -> None:
+    """Close the shared aiohttp session, if one has been created."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -1,16 +1,52 @@
+import logging
 import os
-import json
+import tempfile
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple
+
+import orjson
+
+# Parsed file contents keyed by (path, loader), along with the file stamp they were loaded from
+_FILE_CACHE: Dict[Tuple[str, Callable], Tuple[Tuple[int, int], Any]] = {}
 
 
 def read_json_file(file_directory) -> dict:
     if os.path.exists(file_directory):
-        with open(file_directory, 'r') as file:
-            data = json.load(file)
+        with open(file_directory, 'rb') as file:
+            data = orjson.loads(file.read())
             return data
     return {}
 
 
+def read_file_cached(file_directory: str, loader: Callable[[str], Any]) -> Any:
+    """Load a file with the given loader, reusing the parsed result while the file is unchanged.
+
+    The file is only parsed again when its modification time or size changes, so callers
+    must treat the returned data as read only.
+
+    Args:
+        file_directory(str): Path of the file to read
+        loader(Callable): Function that parses the file from its path
+    Returns:
+        Any: Parsed file content
+    """
+    if not os.path.exists(file_directory):
+        return loader(file_directory)
+    stat = os.stat(file_directory)
+    file_stamp = (stat.st_mtime_ns, stat.st_size)
+    cache_key = (file_directory, loader)
+    cached = _FILE_CACHE.get(cache_key)
+    if cached and cached[0] == file_stamp:
+        return cached[1]
+    data = loader(file_directory)
+    _FILE_CACHE[cache_key] = (file_stamp, data)
+    return data
+
+
+def read_json_file_cached(file_directory: str) -> dict:
+    return read_file_cached(file_directory, read_json_file)
+
+
 def create_tmp_folder(folder_dir):
     Path(folder_dir).mkdir(parents=True, exist_ok=True)
 
@@ -24,11 +60,68 @@ def write_to_json(data: dict, file_path: str) -> None:
     """
     old_data = {}
     if os.path.exists(file_path):
-        with open(file_path, 'r') as file:
-            old_data = json.load(file)
+        with open(file_path, 'rb') as file:
+            old_data = orjson.loads(file.read())
 
     old_data.update(data)
-    with open(file_path, 'w') as file:
-        json.dump(old_data, file, indent=4)
+    write_file_atomic(orjson.dumps(old_data), file_path)
 
 
+def write_file_atomic(data: bytes, file_path: str) -> None:
+    """Replace a file with the given content, readers see either the old or the new file, never a partial one.
+
+    Args:
+        data(bytes): Content of the file
+        file_path(str): File Path where we need to save the data
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".", prefix=".tmp_")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def append_jsonl(records: Iterable, file_path: str) -> None:
+    """Append records to a JSON lines file, one JSON document per line.
+
+    Args:
+        records(Iterable): Records that need to be saved
+        file_path(str): File Path where we need to save the data
+    """
+    # Serialize the whole batch before opening the file, so it is appended with a single write
+    data = b"".join(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE) for record in records)
+    with open(file_path, 'a+b') as file:
+        size = file.seek(0, os.SEEK_END)
+        if size:
+            file.seek(size - 1)
+            if file.read(1) != b"\n":
+                # An earlier append was torn, start on a new line instead of joining onto it
+                data = b"\n" + data
+        file.write(data)
+
+
+def iter_jsonl_file(file_directory: str) -> Iterator[dict]:
+    """Read a JSON lines file record by record.
+
+    Args:
+        file_directory(str): File Path of the JSON lines file
+    Yields:
+        dict: One record per complete, non empty line; torn records are skipped
+    """
+    if not os.path.exists(file_directory):
+        return
+    with open(file_directory, 'rb') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            if not line.endswith(b"\n"):
+                # Last line of an append that is still running or was interrupted
+                logging.warning(f"Skipping an incomplete record at the end of {file_directory}")
+                continue
+            try:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError:
+                logging.warning(f"Skipping an unreadable record in {file_directory}")
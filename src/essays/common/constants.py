@@ -1,12 +1,27 @@
+import os
+
+
 class EssayConfiguration:
     WORDS_BANK_URL = "https://raw.githubusercontent.com/dwyl/english-words/master/words.txt"
     DEFAULT_TOP_WORDS_COUNT = 10
     PROCESSED_CACHED_FOLDER = "tmp"
-    PROCESSED_LINKS_JSON_FILE_PATH = f"{PROCESSED_CACHED_FOLDER}/processed_links.json"
+    PROCESSED_LINKS_JSONL_FILE_PATH = f"{PROCESSED_CACHED_FOLDER}/processed_links.jsonl"
     PROCESSED_FILES_JSON_FILE_PATH = f"{PROCESSED_CACHED_FOLDER}/processed_files.json"
-    DEFAULT_PROCESSING_BATCH_SIZE = 1000
+    # Word counts of files processed before the JSON lines cache, keyed by url
+    LEGACY_PROCESSED_LINKS_JSON_FILE_PATH = f"{PROCESSED_CACHED_FOLDER}/processed_links.json"
+    UPLOADED_URLS_FOLDER = f"{PROCESSED_CACHED_FOLDER}/uploads"
+    UPLOADED_URLS_JSONL_FILE_PATH = f"{UPLOADED_URLS_FOLDER}/{{file_id}}.urls.jsonl"
+    WORD_BANKS_CACHE_FILE_PATH = f"{PROCESSED_CACHED_FOLDER}/word_banks_{{url_hash}}.pkl"
+    WORD_BANKS_META_FILE_PATH = f"{PROCESSED_CACHED_FOLDER}/word_banks_{{url_hash}}.meta.json"
+    CACHE_FLUSH_INTERVAL = 200  # Flush processed urls to the cache after every N completed urls
     DEFAULT_MAX_CONCURRENT_REQUESTS = 10
+    PARSER_WORKERS = os.cpu_count() or 1  # Parser processes, and parser tasks feeding them
+    RESPONSE_CHUNK_SIZE = 64 * 1024
+    MAX_RESPONSE_BYTES = 5 * 1024 * 1024  # Larger pages are truncated
+    TEXT_CONTENT_TYPES = frozenset({"text/html", "application/xhtml+xml", "text/plain"})  # Others are not parsed
     MAX_RETRY_FOR_BACKOFF = 5
+    BACKOFF_BASE_SECONDS = 0.1
+    BACKOFF_CAP_SECONDS = 30
     MAX_HTTP_URLS_SUPPORTED_FOR_API = 20
 
 
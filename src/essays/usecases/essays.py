@@ -1,187 +1,583 @@
-import json
+import contextlib
+import functools
+import concurrent.futures
+import hashlib
+import heapq
+import operator
+import os
+import pickle
+import re
+import sys
 import uuid
 
 import aiohttp
 import asyncio
+import orjson
 import logging
-import requests
 import random
-from bs4 import BeautifulSoup
-from collections import Counter, defaultdict
-from typing import Dict, List, Tuple, Set
+from selectolax.parser import HTMLParser
+from collections import Counter
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple, Set
 from src.essays.common.constants import EssayConfiguration, FileStatus
 from src.essays.common.error_messages import EssayErrorMessages
-from src.common.utility import read_json_file, create_tmp_folder, write_to_json
+from src.common.http_client import get_session
+from src.common.utility import (read_json_file, read_json_file_cached, read_file_cached, create_tmp_folder,
+                                write_to_json, write_file_atomic, append_jsonl, iter_jsonl_file)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Process pools used to parse and count essays outside the event loop, keyed by the word bank their workers hold
+_pools: Dict[FrozenSet[str], concurrent.futures.ProcessPoolExecutor] = {}
+# Number of batches using each pool, and the word bank of the latest batch
+_pool_users = Counter()
+_latest_pool_word_bank = None
+# Word bank of the current worker process, set once by the pool initializer
+_worker_word_bank = frozenset()
+# Serializes appends to the processed links cache across concurrent uploads
+_flush_lock = asyncio.Lock()
+# Candidate words, whole runs of letters so accented words are not split into ASCII pieces,
+# the word bank lookup then drops everything that is not a lowercase ASCII word of 3 letters or more
+_WORD_RE = re.compile(r"[^\W\d_]{3,}")
+
+
+@functools.lru_cache(maxsize=None)
+def load_word_banks(cache_file: str) -> FrozenSet[str]:
+    """Load the cached word banks from disk once and share it across all use case instances.
+
+    Args:
+        cache_file(str): Path of the pickled word banks
+    Returns:
+        frozenset: A set of valid words, interned so lookups of repeated words can match on identity.
+    """
+    with open(cache_file, 'rb') as file:
+        return frozenset(map(sys.intern, pickle.load(file)))
+
+
+@functools.lru_cache(maxsize=1)  # Only the current word banks are hashed again, do not keep older ones alive
+def get_word_banks_hash(word_banks: FrozenSet[str]) -> str:
+    """Fingerprint the word banks, so cached word counts can be matched to the word banks they were filtered with.
+
+    Args:
+        word_banks(frozenset): Set of valid words
+    Returns:
+        str: SHA1 of the sorted words.
+    """
+    return hashlib.sha1("\n".join(sorted(word_banks)).encode("utf-8")).hexdigest()
+
+
+def read_processed_urls(file_path: str) -> Dict[str, Dict]:
+    """Read the processed links cache into a mapping of url to its cached entry.
+
+    Args:
+        file_path(str): Path of the processed links JSON lines file
+    Returns:
+        dict: `{"wb": word banks hash, "counts": word counts}` keyed by url, later records win over earlier ones.
+    """
+    processed_urls = {}
+    for record in iter_jsonl_file(file_path):
+        processed_urls[record["url"]] = {"wb": record.get("wb"), "counts": record["counts"]}
+    return processed_urls
+
+
+def write_processed_urls(processed_urls: Dict[str, Dict[str, int]], file_path: str, word_banks_hash: str) -> None:
+    """Append the word counts of processed urls to the processed links cache.
+
+    Args:
+        processed_urls(Dict): Word counts keyed by url
+        file_path(str): Path of the processed links JSON lines file
+        word_banks_hash(str): Hash of the word banks the counts were filtered with
+    """
+    append_jsonl(({"url": url, "wb": word_banks_hash, "counts": counts} for url, counts in processed_urls.items()),
+                 file_path)
+
+
+def _init_worker(word_bank: Set[str]) -> None:
+    """Keep the word bank as a global of the worker, so it is not pickled for every essay."""
+    global _worker_word_bank
+    # Unpickling in the worker drops the interning of the parent, so intern the words again
+    _worker_word_bank = frozenset(map(sys.intern, word_bank))
+
+
+def _parse_and_count(raw_html: bytes) -> Dict[str, int]:
+    """Extract the visible text of an essay and count the words that are part of the word bank.
+
+    Args:
+        raw_html(bytes): HTML content of the essay
+    Returns:
+        dict: Count of every word bank word found in the essay.
+    """
+    # The Modest backend decodes the bytes with the charset the page declares, lexbor assumes UTF-8
+    tree = HTMLParser(raw_html)
+    # Extract visible text
+    tree.strip_tags(["script", "style"])
+    node = tree.body or tree.root
+    text = node.text(separator=" ", strip=True).lower() if node else ""
+    # Count every candidate word once, then filter the distinct words against the word bank
+    counts = Counter(_WORD_RE.findall(text))
+    return {word: count for word, count in counts.items() if word in _worker_word_bank}
+
+
+@contextlib.contextmanager
+def use_process_pool(word_bank: Set[str]) -> Iterator[concurrent.futures.ProcessPoolExecutor]:
+    """Use the parser process pool of a word bank, starting it on first use.
+
+    Every word bank gets its own pool, so a batch started with a newer word bank never shuts down
+    the pool an older batch is still submitting to. Pools of older word banks are shut down once
+    no batch uses them anymore.
+
+    Args:
+        word_bank(set): Set of valid words the workers filter against
+    Yields:
+        ProcessPoolExecutor: Pool whose workers hold the given word bank.
+    """
+    global _latest_pool_word_bank
+    word_bank = frozenset(word_bank)
+    pool = _pools.get(word_bank)
+    if pool is None:
+        pool = _pools[word_bank] = concurrent.futures.ProcessPoolExecutor(
+            max_workers=EssayConfiguration.PARSER_WORKERS, initializer=_init_worker, initargs=(word_bank,))
+    _latest_pool_word_bank = word_bank
+    _pool_users[word_bank] += 1
+    try:
+        yield pool
+    finally:
+        _pool_users[word_bank] -= 1
+        _retire_idle_process_pools()
+
+
+def _retire_idle_process_pools() -> None:
+    """Shut down the pools of older word banks that no batch uses anymore."""
+    for word_bank in list(_pools):
+        if word_bank != _latest_pool_word_bank and _pool_users[word_bank] <= 0:
+            _pools.pop(word_bank).shutdown(wait=False)
+            del _pool_users[word_bank]
+
+
+def shutdown_process_pool() -> None:
+    """Shut down every parser process pool that has been started."""
+    global _latest_pool_word_bank
+    for pool in _pools.values():
+        pool.shutdown(wait=False)
+    _pools.clear()
+    _pool_users.clear()
+    _latest_pool_word_bank = None
+
 
 class UploadEssaysFileUseCase:
+    __slots__ = ("http_urls", "file_name", "file_id", "word_banks_url", "flush_interval",
+                 "max_concurrent_requests", "cached_file", "already_processed_urls", "file_counter",
+                 "word_banks_hash")
 
     def __init__(self, http_urls, file_name, file_id=None):
         self.http_urls = set(http_urls)
         self.file_name = file_name
         self.file_id = file_id
         self.word_banks_url = EssayConfiguration.WORDS_BANK_URL
-        self.batch_size = EssayConfiguration.DEFAULT_PROCESSING_BATCH_SIZE
+        self.flush_interval = EssayConfiguration.CACHE_FLUSH_INTERVAL
         self.max_concurrent_requests = EssayConfiguration.DEFAULT_MAX_CONCURRENT_REQUESTS  # Control concurrency
-        self.cached_file = EssayConfiguration.PROCESSED_LINKS_JSON_FILE_PATH
-        self.already_processed_urls = read_json_file(file_directory=self.cached_file)
+        self.cached_file = EssayConfiguration.PROCESSED_LINKS_JSONL_FILE_PATH
+        self.already_processed_urls = read_file_cached(self.cached_file, read_processed_urls)
+        self.file_counter = Counter()  # Rolling word counts across every url of this file
+        self.word_banks_hash = None
 
     async def execute(self):
         failed_urls = []
         file_status = FileStatus.PROCESSING
+        file_id = str(uuid.uuid4()) if not self.file_id else self.file_id
+        urls_file = EssayConfiguration.UPLOADED_URLS_JSONL_FILE_PATH.format(file_id=file_id)
+        word_banks_task = None
         try:
             # Create Temp File to store data
-            create_tmp_folder(EssayConfiguration.PROCESSED_CACHED_FOLDER)
+            create_tmp_folder(EssayConfiguration.UPLOADED_URLS_FOLDER)
 
             logging.info(f"File processing has started.")
+            session = await get_session()
+            # Start fetching the list of valid words while the urls of the file are stored
+            word_banks_task = asyncio.create_task(self.get_word_banks(session))
+            # Store the urls of the file once, the status only keeps a reference to them
+            await asyncio.to_thread(append_jsonl, self.http_urls, urls_file)
             # Update the Status as processing first
-            file_id = str(uuid.uuid4()) if not self.file_id else self.file_id
-            processed_file_data = {
-                file_id: {
-                    "file_name": self.file_name,
-                    "status": FileStatus.PROCESSING,
-                    "http_urls": list(self.http_urls),
-                    "failed_urls": failed_urls
-                }
-            }
-            write_to_json(
-                file_path=EssayConfiguration.PROCESSED_FILES_JSON_FILE_PATH,
-                data=processed_file_data
-            )
-
-            # Fetch the list of valid words
-            word_banks = await self.get_word_banks()
-
-            # Get Already processed Urls
-            filtered_urls = [url for url in self.http_urls if url and url not in self.already_processed_urls]
-            # Process URLs in batches
-            for batch_start in range(0, len(filtered_urls), self.batch_size):
-                processed_urls = {}
-                batch_urls = filtered_urls[batch_start: batch_start + self.batch_size]
-                logging.info(f"Processing batch {batch_start // self.batch_size + 1}...")
-                filtered_words, failed_urls = await self.fetch_and_filter_batch(batch_urls, word_banks, processed_urls)
-                write_to_json(data=processed_urls, file_path=self.cached_file)
+            self.write_file_status(file_id, FileStatus.PROCESSING, failed_urls, urls_file)
+
+            word_banks = await word_banks_task
+            if self.word_banks_hash is None:
+                # Not in the word banks metadata, hash them off the event loop
+                self.word_banks_hash = await asyncio.to_thread(get_word_banks_hash, word_banks)
+
+            filtered_urls = self.filter_cached_urls()
+            # Process all URLs concurrently, results are flushed to the cache as they complete
+            logging.info(f"Processing {len(filtered_urls)} urls...")
+            processed_urls = {}
+            failed_urls = await self.fetch_and_filter_batch(filtered_urls, word_banks, processed_urls, session)
 
             file_status = FileStatus.PROCESSED
         except Exception as ex:
             logging.error(f"Error Processing the File, {ex}")
             file_status = FileStatus.FAILED
         finally:
+            if word_banks_task is not None:
+                # Do not leave the download running detached when the upload failed before using it
+                word_banks_task.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await word_banks_task
             # Update the File status in the DB
-            file_id = str(uuid.uuid4()) if not self.file_id else self.file_id
-            processed_file_data = {
-                file_id: {
-                    "file_name": self.file_name,
-                    "status": file_status,
-                    "http_urls": list(self.http_urls),
-                    "failed_urls": failed_urls
-                }
-            }
-            write_to_json(
-                file_path=EssayConfiguration.PROCESSED_FILES_JSON_FILE_PATH,
-                data=processed_file_data
-            )
-        return {"failed_urls": failed_urls, "file_id": file_id}
-
-    async def get_word_banks(self) -> set:
-        """Fetch word banks asynchronously and store them in a set for quick lookup.
+            self.write_file_status(file_id, file_status, failed_urls, urls_file, aggregate=self.file_counter)
+        return {"failed_urls": failed_urls, "file_id": file_id, "status": file_status, "aggregate": self.file_counter}
+
+    def filter_cached_urls(self) -> List[str]:
+        """Add the cached counts of already processed urls to `file_counter` and return the urls left to fetch.
+
+        Cached counts are only reused when they were filtered with the current word banks,
+        the other urls are fetched again.
 
         Returns:
-            set: A set of valid words (minimum length of 3 and alphabetical).
+            list: Urls of the file that need to be fetched, without blank lines.
         """
-        response = requests.get(self.word_banks_url)
-        if response.status_code == 200:
-            word_list = response.text.splitlines()
-            # Filter valid words
-            return {word.strip().lower() for word in word_list if word.isalpha() and len(word) > 2}
+        cached_urls = {url for url in self.http_urls & self.already_processed_urls.keys()
+                       if self.already_processed_urls[url]["wb"] == self.word_banks_hash}
+        for url in cached_urls:
+            self.file_counter.update(self.already_processed_urls[url]["counts"])
+        return list(self.http_urls.difference(cached_urls, ("",)))
+
+    def write_file_status(self,
+                          file_id: str,
+                          status: str,
+                          failed_urls: List[str],
+                          urls_file: str,
+                          aggregate: Dict[str, int] = None) -> None:
+        """Save the status of the file, referencing its urls instead of embedding them.
+
+        Args:
+            file_id(str): File Id that we are processing
+            status(str): Processing status of the file
+            failed_urls(List): URLs that failed to fetch
+            urls_file(str): Path of the JSON lines file holding the urls of the file
+            aggregate(Dict): Total word counts of the file, once known
+        """
+        file_data = {
+            "file_name": self.file_name,
+            "status": status,
+            "url_count": len(self.http_urls),
+            "urls_file": urls_file,
+            "failed_urls": failed_urls
+        }
+        if aggregate is not None:
+            file_data["aggregate"] = aggregate
+        write_to_json(
+            file_path=EssayConfiguration.PROCESSED_FILES_JSON_FILE_PATH,
+            data={file_id: file_data}
+        )
+
+    async def get_word_banks(self, session: aiohttp.ClientSession) -> FrozenSet[str]:
+        """Fetch word banks asynchronously and store them in a frozenset for quick lookup.
+
+        The parsed set is pickled to disk (keyed by the word banks url) along with the `ETag` and
+        `Last-Modified` headers it was downloaded with and its hash. Later calls revalidate it with a
+        conditional request and only download and parse the word banks again when the remote file
+        changed, or when the cached copy cannot be read. The hash of the returned word banks is kept
+        in `word_banks_hash` when it is known.
 
-        # Return an empty set if fetching fails
-        return set()
+        Args:
+            session (ClientSession): A session object for making HTTP requests.
+        Returns:
+            frozenset: A set of valid words (minimum length of 3 and alphabetical).
+        """
+        url_hash = hashlib.sha1(self.word_banks_url.encode("utf-8")).hexdigest()
+        cache_file = EssayConfiguration.WORD_BANKS_CACHE_FILE_PATH.format(url_hash=url_hash)
+        meta_file = EssayConfiguration.WORD_BANKS_META_FILE_PATH.format(url_hash=url_hash)
+        cached_word_banks = self.read_cached_word_banks(cache_file)
+        is_cached = cached_word_banks is not None
+        try:
+            meta = read_json_file(meta_file) if is_cached else {}
+        except ValueError:
+            # Unreadable validators, download the word banks again
+            cached_word_banks, is_cached, meta = None, False, {}
+        self.word_banks_hash = meta.get("hash")
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        if is_cached and not headers:
+            # Nothing to revalidate with, the cached copy is used as is
+            return cached_word_banks
+
+        try:
+            async with session.get(self.word_banks_url, headers=headers) as response:
+                if response.status == 304 or (is_cached and response.status != 200):
+                    # Not modified, or the remote is unavailable and the cached copy is the best we have
+                    return cached_word_banks
+                if response.status != 200:
+                    # Return an empty set if fetching fails
+                    self.word_banks_hash = None
+                    return frozenset()
+                # Decode with the declared charset, text() would run charset detection when it is missing
+                text = (await response.read()).decode(response.charset or "utf-8", errors="ignore")
+                meta = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if not is_cached:
+                raise
+            logging.warning(f"Could not revalidate the word banks, using the cached copy: {e!r}")
+            return cached_word_banks
+
+        # Filter valid words, splitlines already drops the line endings
+        word_banks = frozenset(word for word in (line.lower() for line in text.splitlines())
+                               if len(word) > 2 and word.isascii() and word.isalpha())
+        # Hash the word banks once, when they are written, so later loads read it from the metadata
+        meta["hash"] = self.word_banks_hash = await asyncio.to_thread(get_word_banks_hash, word_banks)
+        create_tmp_folder(EssayConfiguration.PROCESSED_CACHED_FOLDER)
+        # Replace the files atomically, an interrupted write must not leave a truncated pickle behind
+        write_file_atomic(pickle.dumps(word_banks), cache_file)
+        write_file_atomic(orjson.dumps(meta), meta_file)
+        # Go through the shared copy, so every caller gets the same word banks object
+        load_word_banks.cache_clear()
+        return load_word_banks(cache_file)
+
+    @staticmethod
+    def read_cached_word_banks(cache_file: str) -> Optional[FrozenSet[str]]:
+        """Read the cached word banks, if there is a readable copy.
+
+        Args:
+            cache_file(str): Path of the pickled word banks
+        Returns:
+            frozenset: The cached word banks, or None when missing or unreadable.
+        """
+        if not os.path.exists(cache_file):
+            return None
+        try:
+            return load_word_banks(cache_file)
+        except Exception as e:
+            logging.warning(f"Could not read the cached word banks, downloading them again: {e}")
+            return None
 
     async def fetch_and_filter_batch(self,
                                      batch_urls: List[str],
                                      word_banks: Set[str],
-                                     processed_urls: Dict) -> Tuple[List[str], List]:
-        """Fetch and filter a batch of URLs concurrently.
+                                     processed_urls: Dict,
+                                     session: aiohttp.ClientSession) -> List[str]:
+        """Fetch and filter URLs as a two stage pipeline, flushing results to the cache as they complete.
+
+        Fetcher tasks (limited by one semaphore, released while backing off) push the raw HTML of every URL
+        onto a bounded queue, while one parser task per pool worker consumes it and counts the words in the
+        process pool.
+        Network IO and parsing therefore overlap instead of alternating inside each URL.
 
         Args:
             batch_urls (List): List of URLs to fetch and filter.
             word_banks (set): Set of valid words to filter against.
-            processed_urls(Dict): To Keep Track which url has been processed
+            processed_urls(Dict): To Keep Track which url has been processed since the last flush
+            session (ClientSession): A session object for making HTTP requests.
         Returns:
-            tuple: A list of filtered words and a list of failed URLs.
+            list: A list of failed URLs, the word counts are kept in `processed_urls` and `file_counter`.
         """
         failed_urls = []
         semaphore = asyncio.Semaphore(self.max_concurrent_requests)  # Limit concurrent requests
-        async with aiohttp.ClientSession() as session:
-            # Create tasks for fetching and filtering each URL
-            tasks = [self.fetch_and_filter_content(url,
-                                                   word_banks,
-                                                   session,
-                                                   semaphore,
-                                                   failed_urls,
-                                                   processed_urls)
-                     for url in batch_urls]
-            # Await all tasks to complete
-            results = await asyncio.gather(*tasks)
-            # Flatten the filtered results into a single list
-            return [word.strip() for result in results for word in result if result], failed_urls
+        # Bounded, so fetchers wait for the parsers instead of buffering every page in memory
+        queue = asyncio.Queue(maxsize=2 * self.max_concurrent_requests)
+        with use_process_pool(word_banks) as pool:
+            parsers = [asyncio.create_task(self.parse_and_filter_content(queue, pool, processed_urls, failed_urls))
+                       for _ in range(EssayConfiguration.PARSER_WORKERS)]
+            fetchers = [asyncio.create_task(self.fetch_content(url, session, semaphore, failed_urls, queue))
+                        for url in batch_urls]
+            closer = asyncio.create_task(self.close_queue(fetchers, queue, len(parsers)))
+            tasks = [closer, *fetchers, *parsers]
+            try:
+                # Wait on both stages together, so a failing parser cannot leave the fetchers blocked on the queue
+                done, _ = await asyncio.wait([closer, *parsers], return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    if task.exception() is not None:
+                        raise task.exception()
+            finally:
+                # Do not leave the other stage hanging when one of them fails
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Flush the remaining processed urls
+        await self.flush_processed_urls(processed_urls)
+        return failed_urls
 
     @staticmethod
-    async def fetch_and_filter_content(url: str,
-                                       word_bank: Set[str],
-                                       session: aiohttp.ClientSession,
-                                       semaphore: asyncio.Semaphore,
-                                       failed_urls: List[str],
-                                       processed_urls: Dict) -> List[str]:
-        """Fetch content of a single URL asynchronously and filter it against the word bank.
+    async def close_queue(fetchers: List[asyncio.Task], queue: asyncio.Queue, parser_count: int) -> None:
+        """Wait for every fetcher, then queue one sentinel per parser.
+
+        Args:
+            fetchers (List): Fetcher tasks filling the queue.
+            queue (Queue): Queue consumed by the parsers.
+            parser_count (int): Number of parsers consuming the queue.
+        """
+        await asyncio.gather(*fetchers)
+        for _ in range(parser_count):
+            await queue.put(None)
+
+    async def flush_processed_urls(self, processed_urls: Dict) -> None:
+        """Append the processed urls to the cache and clear them.
+
+        The append runs in a thread, under a lock shared by every upload, so fetches keep
+        going while the cache is written and concurrent flushes never interleave.
+
+        Args:
+            processed_urls(Dict): Urls processed since the last flush, kept when the append fails
+        """
+        if not processed_urls:
+            return
+        # Urls processed while the append runs stay in `processed_urls` for the next flush
+        pending = dict(processed_urls)
+        processed_urls.clear()
+        try:
+            async with _flush_lock:
+                await asyncio.to_thread(write_processed_urls, pending, self.cached_file, self.word_banks_hash)
+        except Exception:
+            processed_urls.update(pending)
+            raise
+
+    async def fetch_content(self,
+                            url: str,
+                            session: aiohttp.ClientSession,
+                            semaphore: asyncio.Semaphore,
+                            failed_urls: List[str],
+                            queue: asyncio.Queue) -> None:
+        """Fetch content of a single URL asynchronously and queue it for parsing.
 
         Args:
             url (str): The URL to fetch.
-            word_bank (set): Set of valid words to filter against.
             session (ClientSession): A session object for making HTTP requests.
             semaphore (Semaphore): A semaphore to limit the number of concurrent requests.
             failed_urls (list): List to track URLs that failed to fetch.
-            processed_urls(Dict): To Keep Track which url has been processed
-
-        Returns:
-            list: A list of filtered words from the URL content.
+            queue (Queue): Queue of `(url, raw_html)` consumed by the parsers, the HTML is kept as bytes
+                and is empty for responses that are not text.
         """
-        async with semaphore:
-            retries = 0
-            while retries < EssayConfiguration.MAX_RETRY_FOR_BACKOFF:
-                try:
+        # Bind lookups used inside the retry loop to locals
+        max_retry = EssayConfiguration.MAX_RETRY_FOR_BACKOFF
+        backoff_base = EssayConfiguration.BACKOFF_BASE_SECONDS
+        backoff_cap = EssayConfiguration.BACKOFF_CAP_SECONDS
+        delay = backoff_base
+        retries = 0
+        while retries < max_retry:
+            try:
+                # Hold a request slot while fetching and queueing, but not while backing off
+                async with semaphore:
                     async with session.get(url) as response:
                         if response.status == 429:  # Too many requests
-                            raise asyncio.TimeoutError("Rate limited")
-
-                        soup = BeautifulSoup(await response.text(), 'html.parser')
-                        # Extract visible text
-                        text = soup.get_text()
-                        # Split text into words
-                        words = text.split()
-                        # Filter words on-the-fly
-                        words = [word.strip().lower() for word in words if word in word_bank]
-                        processed_urls[url] = Counter(words)
-                        return words
-
-                except asyncio.TimeoutError as e:
-                    retries += 1
-                    wait_time = random.uniform(2, 2 ** retries)
-                    logging.warning(f"Rate Limit Error fetching {url}: {e}. Retrying in {wait_time:.2f} seconds...")
-                    await asyncio.sleep(wait_time)
-                except aiohttp.ClientError as e:
-                    logging.warning(f"Client Error fetching {url}: {e}")
-                    break
-
-            logging.error(f"Failed to fetch {url} after {retries} retries.")
-            failed_urls.append(url)
-            return []
+                            retry_after = self.get_retry_after(response)
+                        elif self.is_text_response(response):
+                            raw_html = await self.read_content(response)
+                        else:
+                            # PDFs, images and other binaries have no essay text, skip downloading them
+                            raw_html = b""
+                    if response.status != 429:
+                        await queue.put((url, raw_html))
+                        return
+
+                # Rate limited, wait as long as the server asked once the connection is released,
+                # or back off like a timeout when it did not say
+                retries += 1
+                if retry_after is None:
+                    delay = wait_time = min(backoff_cap, random.uniform(backoff_base, delay * 3))
+                else:
+                    wait_time = min(retry_after, backoff_cap) + random.random()
+                logging.warning(f"Rate Limit Error fetching {url}. Retrying in {wait_time:.2f} seconds...")
+                await asyncio.sleep(wait_time)
+            except asyncio.TimeoutError as e:
+                retries += 1
+                # Decorrelated jitter, grows from the previous delay but never past the cap
+                delay = min(backoff_cap, random.uniform(backoff_base, delay * 3))
+                logging.warning(f"Timeout Error fetching {url}: {e}. Retrying in {delay:.2f} seconds...")
+                await asyncio.sleep(delay)
+            except aiohttp.ClientError as e:
+                logging.warning(f"Client Error fetching {url}: {e}")
+                break
+
+        logging.error(f"Failed to fetch {url} after {retries} retries.")
+        failed_urls.append(url)
+
+    async def parse_and_filter_content(self,
+                                       queue: asyncio.Queue,
+                                       pool: concurrent.futures.ProcessPoolExecutor,
+                                       processed_urls: Dict,
+                                       failed_urls: List[str]) -> None:
+        """Parse queued pages in the process pool and filter them against the word bank, until a sentinel arrives.
+
+        The filtered counts are merged into the rolling `file_counter`, and `processed_urls` is flushed
+        to the cache every `flush_interval` URLs.
+
+        Args:
+            queue (Queue): Queue of `(url, raw_html)` filled by the fetchers, `None` stops the parser.
+            pool (ProcessPoolExecutor): Parser process pool holding the word bank.
+            processed_urls(Dict): To Keep Track which url has been processed since the last flush
+            failed_urls (list): List to track URLs that failed to parse.
+        """
+        loop = asyncio.get_running_loop()
+        file_counter = self.file_counter
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            url, raw_html = item
+            try:
+                # Nothing to parse in an empty body, it is cached without words
+                filtered_counts = await loop.run_in_executor(pool, _parse_and_count, raw_html) if raw_html else {}
+            except Exception as e:
+                logging.error(f"Failed to parse {url}: {e}")
+                failed_urls.append(url)
+                continue
+            processed_urls[url] = filtered_counts
+            file_counter.update(filtered_counts)
+            if len(processed_urls) >= self.flush_interval:
+                await self.flush_processed_urls(processed_urls)
+
+    @staticmethod
+    def is_text_response(response: aiohttp.ClientResponse) -> bool:
+        """Check whether a response holds text worth parsing.
+
+        Args:
+            response (ClientResponse): The response to check.
+
+        Returns:
+            bool: True for HTML or plain text responses, and for responses without a `Content-Type`.
+        """
+        if "Content-Type" not in response.headers:
+            return True
+        return response.content_type in EssayConfiguration.TEXT_CONTENT_TYPES
+
+    @staticmethod
+    async def read_content(response: aiohttp.ClientResponse) -> bytes:
+        """Read the body of a response chunk by chunk, up to `MAX_RESPONSE_BYTES`.
+
+        Args:
+            response (ClientResponse): The response to read.
+
+        Returns:
+            bytes: The body, truncated when the page is larger than the limit.
+        """
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(EssayConfiguration.RESPONSE_CHUNK_SIZE):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= EssayConfiguration.MAX_RESPONSE_BYTES:
+                logging.warning(f"Truncating {response.url} after {size} bytes.")
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    def get_retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+        """Get the seconds to wait before retrying a rate limited request.
+
+        Args:
+            response (ClientResponse): The rate limited response.
+
+        Returns:
+            float: Seconds from the `Retry-After` header, or None when missing or not numeric.
+        """
+        try:
+            return max(0.0, float(response.headers["Retry-After"]))
+        except (KeyError, ValueError):
+            return None
 
 
 class GetMaxWordCountsFromEssays:
+    __slots__ = ("http_urls", "top_words", "file_name", "file_id", "cached_file")
 
     def __init__(self,
                  http_urls: List[str],
@@ -201,16 +597,16 @@ class GetMaxWordCountsFromEssays:
         self.top_words = top_words
         self.file_name = file_name
         self.file_id = file_id
-        self.cached_file = EssayConfiguration.PROCESSED_LINKS_JSON_FILE_PATH
+        self.cached_file = EssayConfiguration.PROCESSED_LINKS_JSONL_FILE_PATH
 
     async def execute(self):
         """Execute the main process of fetching and filtering words from the provided URLs.
 
-        This method processes the URLs in batches, filters the words against the word bank,
-        writes the filtered results to a CSV file, and retrieves the top 10 words from the results.
+        This method processes the URLs, filters the words against the word bank and picks the
+        top words straight from the aggregate built while processing, without reading it back.
 
         Returns:
-            JSONResponse: Contains the top words and any failed URLs.
+            dict: Contains the top words and any failed URLs.
         """
 
         # Process the Urls and Save Every Word Count
@@ -219,16 +615,22 @@ class GetMaxWordCountsFromEssays:
             file_name=self.file_name
         ).execute()
 
-        # Read the filtered words from the output file and get the top 10
-        final_response = GetMaxCountsBasedOnID(
-            file_id=response.get("file_id"),
-            top_words=self.top_words
-        ).execute()
-        logging.info(f"Response: {json.dumps(final_response, indent=4)}")
+        if response["status"] != FileStatus.PROCESSED:
+            # Report the file status the same way the get by id API does
+            return GetMaxCountsBasedOnID(file_id=response["file_id"], top_words=self.top_words).execute()
+
+        top_words = self.top_words or EssayConfiguration.DEFAULT_TOP_WORDS_COUNT
+        final_response = {
+            "top_words": dict(response["aggregate"].most_common(top_words)),
+            "failed_urls": response["failed_urls"],
+            "file_id": response["file_id"]
+        }
+        logging.debug("Response: %s", final_response)
         return final_response
 
 
 class GetMaxCountsBasedOnID:
+    __slots__ = ("file_id", "top_words")
 
     def __init__(self,
                  file_id: str,
@@ -243,16 +645,16 @@ class GetMaxCountsBasedOnID:
         error, content = self.check_status_in_file()
         if error:
             return content
-        http_urls = content["http_urls"]
         failed_urls = content["failed_urls"]
 
-        with open(EssayConfiguration.PROCESSED_LINKS_JSON_FILE_PATH, 'r') as file:
-            data = file.read()
-            if not data:
-                top_words = []
-            else:
-                data = json.loads(data)
-                top_words = self.get_top_words(data, http_urls)
+        if "aggregate" in content:
+            # Word counts were aggregated while the file was processed
+            top_words = self.select_top_words(content["aggregate"])
+        else:
+            # Files processed before the aggregate existed embed their urls,
+            # and their word counts are in the legacy processed links JSON file
+            data = read_json_file_cached(EssayConfiguration.LEGACY_PROCESSED_LINKS_JSON_FILE_PATH)
+            top_words = self.get_top_words(data, content.get("http_urls", [])) if data else []
 
         # Prepare the response with top words and any failed URLs
         response = {
@@ -263,7 +665,7 @@ class GetMaxCountsBasedOnID:
         return response
 
     def check_status_in_file(self) -> Tuple[bool, dict]:
-        processed_files = read_json_file(file_directory=EssayConfiguration.PROCESSED_FILES_JSON_FILE_PATH)
+        processed_files = read_json_file_cached(file_directory=EssayConfiguration.PROCESSED_FILES_JSON_FILE_PATH)
         if self.file_id in processed_files and processed_files[self.file_id].get("status") == FileStatus.PROCESSED:
             return False, processed_files[self.file_id]
         elif self.file_id not in processed_files:
@@ -272,15 +674,20 @@ class GetMaxCountsBasedOnID:
 
     @staticmethod
     def aggregate_word_counts(data: Dict, https_urls: List[str]) -> Dict:
-        # Create a default dictionary to hold total word counts
-        total_counts = defaultdict(int)
-
-        # Iterate through each URL's word dictionary
-        for url, word_counts in data.items():
-            if url not in https_urls:
-                continue
-            for word, count in word_counts.items():
-                total_counts[word] += count  # Aggregate counts
+        # Create a counter to hold total word counts
+        total_counts = Counter()
+        url_set = set(https_urls)
+
+        # Only walk the smaller side, either the file's urls or the cached urls
+        if len(url_set) < len(data):
+            url_word_counts = ((url, data.get(url)) for url in url_set)
+        else:
+            url_word_counts = ((url, word_counts) for url, word_counts in data.items() if url in url_set)
+
+        # Merge each URL's word dictionary, Counter.update runs the inner loop in C
+        for url, word_counts in url_word_counts:
+            if word_counts:
+                total_counts.update(word_counts)
         return total_counts
 
     def get_top_words(self, words_list: Dict, https_urls: List[str]) -> Dict:
@@ -295,5 +702,15 @@ class GetMaxCountsBasedOnID:
         """
         # Count occurrences of each word
         total_counts = self.aggregate_word_counts(words_list, https_urls)
-        sorted_words = sorted(total_counts.items(), key=lambda x: x[1], reverse=True)
-        return dict(sorted_words[:self.top_words])
+        return self.select_top_words(total_counts)
+
+    def select_top_words(self, word_counts: Dict) -> Dict:
+        """Select the most frequent words from already aggregated word counts.
+
+        Args:
+            word_counts (dict): Total count of every word.
+
+        Returns:
+            dict: A dictionary of the top words and their counts.
+        """
+        return dict(heapq.nlargest(self.top_words, word_counts.items(), key=operator.itemgetter(1)))
@@ -1,10 +1,25 @@
 import asyncio
 import sys
 import logging
-from src.essays.usecases.essays import GetMaxWordCountsFromEssays
+from src.common.http_client import close_session
+from src.essays.usecases.essays import GetMaxWordCountsFromEssays, shutdown_process_pool
+
+try:
+    import uvloop
+except ImportError:  # Not installed on Windows, the default event loop is used instead
+    uvloop = None
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+
+async def run(use_case: GetMaxWordCountsFromEssays):
+    try:
+        return await use_case.execute()
+    finally:
+        await close_session()
+        shutdown_process_pool()
+
+
 if __name__ == "__main__":
     first_parameter = input("Please provide File Path: ")
     top_words = input("Please provide number of top words to return(Default 10): ")
@@ -26,4 +41,8 @@ if __name__ == "__main__":
     if top_words:
         client_input['top_words'] = int(top_words)
     upload_use_case = GetMaxWordCountsFromEssays(**client_input)
-    asyncio.run(upload_use_case.execute())
+    if uvloop is not None:
+        # Same event loop the server gets from uvicorn's default `--loop auto`
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    response = asyncio.run(run(upload_use_case))
+    logging.info(f"Response: {response}")
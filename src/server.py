@@ -1,28 +1,40 @@
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
 from src.common.constants import ServerConfiguration
+from src.common.http_client import close_session
 from src.essays.routers.essays import essays_router_v1
+from src.essays.usecases.essays import shutdown_process_pool
 
 # Initialize FastAPI app with custom title and version
 app = FastAPI(
     title="FireFly AI Assignment",
     version="1.0.0",
     description="This is a FastAPI application with health check and Swagger setup for Firefly assignment.",
-    swagger_ui_parameters={"displayRequestDuration": True}
+    swagger_ui_parameters={"displayRequestDuration": True},
+    default_response_class=ORJSONResponse
 )
 
 # Include Routers
 app.include_router(essays_router_v1)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Close the shared HTTP client session and the parser process pool when the server stops.
+    """
+    await close_session()
+    shutdown_process_pool()
+
+
 # Health Check API
 @app.get("/v1/health", tags=["Health"])
 async def health_check():
     """
     Health check API to verify if the server is running properly.
     """
-    return JSONResponse(status_code=200, content={
+    return ORJSONResponse(status_code=200, content={
         "status": "healthy"
     })
 
@@ -1,56 +1,159 @@
+import os
+import tempfile
 import unittest
-from unittest.mock import patch, Mock, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
+import aiohttp
 import asyncio
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
+from src.common.utility import write_to_json
+from src.essays.common.constants import EssayConfiguration
 from src.essays.usecases.essays import (
     UploadEssaysFileUseCase,
     GetMaxWordCountsFromEssays,
     GetMaxCountsBasedOnID,
-    FileStatus
+    FileStatus,
+    load_word_banks,
+    get_word_banks_hash,
+    shutdown_process_pool,
+    use_process_pool,
+    _parse_and_count,
+    read_processed_urls,
+    write_processed_urls
 )
 
 
-class TestUploadEssaysFileUseCase(unittest.TestCase):
+def patch_cache_folder(test_case: unittest.TestCase) -> str:
+    """Point every cache file of the essays at a temporary folder until the test ends."""
+    tmp_dir = tempfile.TemporaryDirectory()
+    test_case.addCleanup(tmp_dir.cleanup)
+    folder = tmp_dir.name
+    paths = {
+        "PROCESSED_CACHED_FOLDER": folder,
+        "PROCESSED_LINKS_JSONL_FILE_PATH": os.path.join(folder, "processed_links.jsonl"),
+        "PROCESSED_FILES_JSON_FILE_PATH": os.path.join(folder, "processed_files.json"),
+        "LEGACY_PROCESSED_LINKS_JSON_FILE_PATH": os.path.join(folder, "processed_links.json"),
+        "UPLOADED_URLS_FOLDER": os.path.join(folder, "uploads"),
+        "UPLOADED_URLS_JSONL_FILE_PATH": os.path.join(folder, "uploads", "{file_id}.urls.jsonl"),
+        "WORD_BANKS_CACHE_FILE_PATH": os.path.join(folder, "word_banks_{url_hash}.pkl"),
+        "WORD_BANKS_META_FILE_PATH": os.path.join(folder, "word_banks_{url_hash}.meta.json"),
+    }
+    for name, path in paths.items():
+        patcher = patch.object(EssayConfiguration, name, path)
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+    return folder
+
+
+class TestUploadEssaysFileUseCase(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
+        self.cache_folder = patch_cache_folder(self)
         self.test_urls = ["https://test1.com", "https://test2.com"]
         self.file_name = "test_file.txt"
         self.use_case = UploadEssaysFileUseCase(self.test_urls, self.file_name)
 
-    @patch('requests.get')
-    async def test_get_word_banks(self, mock_get):
+    def tearDown(self):
+        load_word_banks.cache_clear()
+        shutdown_process_pool()
+
+    async def test_get_word_banks(self):
         # Mock response for word banks
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.text = "hello\nworld\ntest\n"
-        mock_get.return_value = mock_response
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        mock_response.headers = {"ETag": '"test"'}
+        mock_response.charset = "utf-8"
+        mock_response.read.return_value = b"hello\nworld\ntest\n"
+        mock_session = MagicMock()
+        mock_session.get.return_value.__aenter__.return_value = mock_response
 
         # Run the test
-        word_banks = await self.use_case.get_word_banks()
+        word_banks = await self.use_case.get_word_banks(mock_session)
 
-        self.assertIsInstance(word_banks, set)
+        self.assertIsInstance(word_banks, frozenset)
         self.assertTrue(all(len(word) > 2 for word in word_banks))
         self.assertTrue(all(word.isalpha() for word in word_banks))
+        # The word banks are cached in the temporary folder, never in the real one
+        self.assertTrue(any(name.endswith(".pkl") for name in os.listdir(self.cache_folder)))
 
-    @patch('requests.get')
-    async def test_get_word_banks_failed(self, mock_get):
+    async def test_get_word_banks_failed(self):
         # Mock failed response
-        mock_response = Mock()
-        mock_response.status_code = 404
-        mock_get.return_value = mock_response
+        mock_response = AsyncMock()
+        mock_response.status = 404
+        mock_session = MagicMock()
+        mock_session.get.return_value.__aenter__.return_value = mock_response
+
+        # Run the test
+        word_banks = await self.use_case.get_word_banks(mock_session)
+
+        self.assertEqual(word_banks, frozenset())
+
+    @staticmethod
+    def mock_word_banks_session(status, body=b"", headers=None):
+        mock_response = AsyncMock()
+        mock_response.status = status
+        mock_response.headers = headers or {}
+        mock_response.charset = "utf-8"
+        mock_response.read.return_value = body
+        mock_session = MagicMock()
+        mock_session.get.return_value.__aenter__.return_value = mock_response
+        return mock_session
+
+    async def cache_word_banks(self):
+        session = self.mock_word_banks_session(200, b"hello\nworld\n", {"ETag": '"v1"'})
+        return await self.use_case.get_word_banks(session)
+
+    async def test_get_word_banks_not_modified(self):
+        cached = await self.cache_word_banks()
+        self.assertEqual(self.use_case.word_banks_hash, get_word_banks_hash(cached))
+        use_case = UploadEssaysFileUseCase(self.test_urls, self.file_name)
+        mock_session = self.mock_word_banks_session(304)
 
         # Run the test
-        word_banks = asyncio.run(self.use_case.get_word_banks())
+        with patch('src.essays.usecases.essays.get_word_banks_hash') as mock_get_word_banks_hash:
+            word_banks = await use_case.get_word_banks(mock_session)
+
+        self.assertIs(word_banks, cached)
+        self.assertEqual(mock_session.get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+        # The hash is read from the word banks metadata instead of hashing them again
+        mock_get_word_banks_hash.assert_not_called()
+        self.assertEqual(use_case.word_banks_hash, self.use_case.word_banks_hash)
+
+    async def test_get_word_banks_offline(self):
+        cached = await self.cache_word_banks()
+
+        for error in (aiohttp.ClientConnectionError("offline"), asyncio.TimeoutError()):
+            with self.subTest(error=error):
+                mock_session = MagicMock()
+                mock_session.get.side_effect = error
 
-        self.assertEqual(word_banks, set())
+                # Run the test
+                word_banks = await self.use_case.get_word_banks(mock_session)
+
+                self.assertIs(word_banks, cached)
+
+    async def test_get_word_banks_unreadable_cache(self):
+        await self.cache_word_banks()
+        cache_files = [name for name in os.listdir(self.cache_folder) if name.endswith(".pkl")]
+        with open(os.path.join(self.cache_folder, cache_files[0]), "wb") as file:
+            file.write(b"\x80truncated")
+        load_word_banks.cache_clear()
+        mock_session = self.mock_word_banks_session(200, b"fresh\nwords\n", {"ETag": '"v2"'})
+
+        # Run the test
+        word_banks = await self.use_case.get_word_banks(mock_session)
+
+        # The unreadable copy is not revalidated, the word banks are downloaded again
+        self.assertEqual(word_banks, frozenset({"fresh", "words"}))
+        self.assertEqual(mock_session.get.call_args.kwargs["headers"], {})
 
     @patch('aiohttp.ClientSession')
-    async def test_fetch_and_filter_content(self, mock_session):
+    async def test_fetch_content(self, mock_session):
         # Mock setup
         url = "https://test.com"
-        word_bank = {"test", "content"}
         mock_response = AsyncMock()
-        mock_response.text.return_value = "<html>test content test</html>"
+        mock_response.content = MagicMock()
+        mock_response.content.iter_chunked.return_value.__aiter__.return_value = [b"<html>test ", b"content test</html>"]
         mock_response.status = 200
 
         mock_session_context = AsyncMock()
@@ -59,67 +162,285 @@ class TestUploadEssaysFileUseCase(unittest.TestCase):
 
         semaphore = asyncio.Semaphore(1)
         failed_urls = []
+        queue = asyncio.Queue()
+
+        # Run the test
+        await self.use_case.fetch_content(url, mock_session, semaphore, failed_urls, queue)
+
+        self.assertEqual(queue.get_nowait(), (url, b"<html>test content test</html>"))
+        self.assertEqual(failed_urls, [])
+
+    async def test_fetch_content_skips_non_text(self):
+        # Mock a PDF response
+        url = "https://test.com/essay.pdf"
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        mock_response.headers = {"Content-Type": "application/pdf"}
+        mock_response.content_type = "application/pdf"
+        mock_session = MagicMock()
+        mock_session.get.return_value.__aenter__.return_value = mock_response
+
+        failed_urls = []
+        queue = asyncio.Queue()
+
+        # Run the test
+        await self.use_case.fetch_content(url, mock_session, asyncio.Semaphore(1), failed_urls, queue)
+
+        self.assertEqual(queue.get_nowait(), (url, b""))
+        mock_response.content.iter_chunked.assert_not_called()
+        self.assertEqual(failed_urls, [])
+
+    async def fetch_with_retries(self, mock_session):
+        url = "https://test.com"
+        failed_urls = []
+        queue = asyncio.Queue()
+        with patch('src.essays.usecases.essays.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+            await self.use_case.fetch_content(url, mock_session, asyncio.Semaphore(1), failed_urls, queue)
+
+        # The url is given up on after every retry, nothing is queued
+        self.assertEqual(failed_urls, [url])
+        self.assertTrue(queue.empty())
+        return [call.args[0] for call in mock_sleep.call_args_list]
+
+    def assert_delays(self, delays, expected):
+        self.assertEqual(len(delays), len(expected))
+        for delay, expected_delay in zip(delays, expected):
+            self.assertAlmostEqual(delay, expected_delay)
+
+    @staticmethod
+    def mock_rate_limited_session(headers):
+        mock_response = AsyncMock()
+        mock_response.status = 429
+        mock_response.headers = headers
+        mock_session = MagicMock()
+        mock_session.get.return_value.__aenter__.return_value = mock_response
+        return mock_session
+
+    async def test_fetch_content_rate_limited_with_retry_after(self):
+        delays = await self.fetch_with_retries(self.mock_rate_limited_session({"Retry-After": "2"}))
+
+        # The server's delay plus up to a second of jitter, every time
+        self.assertEqual(len(delays), EssayConfiguration.MAX_RETRY_FOR_BACKOFF)
+        self.assertTrue(all(2 <= delay < 3 for delay in delays))
+
+    @patch('src.essays.usecases.essays.random.uniform', side_effect=lambda low, high: high)
+    async def test_fetch_content_rate_limited_without_retry_after(self, mock_uniform):
+        delays = await self.fetch_with_retries(self.mock_rate_limited_session({}))
+
+        # Decorrelated jitter, each delay grows from the previous one up to the cap
+        self.assert_delays(delays, [0.3, 0.9, 2.7, 8.1, 24.3])
+
+    @patch('src.essays.usecases.essays.random.uniform', side_effect=lambda low, high: high)
+    async def test_fetch_content_timeout(self, mock_uniform):
+        mock_session = MagicMock()
+        mock_session.get.side_effect = asyncio.TimeoutError()
+
+        delays = await self.fetch_with_retries(mock_session)
+
+        self.assert_delays(delays, [0.3, 0.9, 2.7, 8.1, 24.3])
+
+    @patch('src.essays.usecases.essays._worker_word_bank', frozenset({"test", "content"}))
+    async def test_parse_and_filter_content(self):
+        # Mock setup
+        url = "https://test.com"
+        queue = asyncio.Queue()
+        queue.put_nowait((url, b"<html><body>test content, test. other</body></html>"))
+        queue.put_nowait(None)
         processed_urls = {}
+        failed_urls = []
 
         # Run the test
-        result = await self.use_case.fetch_and_filter_content(
-            url, word_bank, mock_session, semaphore, failed_urls, processed_urls
-        )
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            await self.use_case.parse_and_filter_content(queue, pool, processed_urls, failed_urls)
+
+        self.assertEqual(processed_urls, {url: {"test": 2, "content": 1}})
+        self.assertEqual(self.use_case.file_counter, Counter({"test": 2, "content": 1}))
+        self.assertEqual(failed_urls, [])
+
+    @patch('src.essays.usecases.essays._worker_word_bank', frozenset({"hello", "world"}))
+    def test_parse_and_count_non_utf8_page(self):
+        raw_html = b'<html><head><meta charset="windows-1252"></head><body>caf\xe9 hello world</body></html>'
 
-        self.assertIsInstance(result, list)
-        self.assertTrue(all(word in word_bank for word in result))
+        self.assertEqual(_parse_and_count(raw_html), {"hello": 1, "world": 1})
+        self.assertEqual(_parse_and_count(b"<body>caf\xe9 hello</body>"), {"hello": 1})
 
+    @patch('src.essays.usecases.essays._worker_word_bank', frozenset({"sum", "ber", "ade", "hello"}))
+    def test_parse_and_count_keeps_accented_words_whole(self):
+        raw_html = "<body>résumé über façade hello</body>".encode("utf-8")
+
+        self.assertEqual(_parse_and_count(raw_html), {"hello": 1})
+
+    @patch('src.essays.usecases.essays.write_processed_urls')
     @patch('aiohttp.ClientSession')
-    async def test_fetch_and_filter_batch(self):
+    async def test_fetch_and_filter_batch(self, mock_session, mock_write_processed_urls):
         # Mock setup
         batch_urls = ["https://test1.com", "https://test2.com"]
         word_banks = {"test", "content"}
         processed_urls = {}
+        mock_response = mock_session.get.return_value.__aenter__.return_value
+        mock_response.status = 200
+        mock_response.content = MagicMock()
+        mock_response.content.iter_chunked.return_value.__aiter__.return_value = [b"<html>test content</html>"]
 
         # Run the test
-        filtered_words, failed_urls = await self.use_case.fetch_and_filter_batch(
-            batch_urls, word_banks, processed_urls
+        failed_urls = await self.use_case.fetch_and_filter_batch(
+            batch_urls, word_banks, processed_urls, mock_session
         )
 
-        self.assertIsInstance(filtered_words, list)
-        self.assertIsInstance(failed_urls, list)
-
-    @patch('src.common.utility.write_to_json')
-    @patch('src.common.utility.read_json_file')
-    async def test_execute(self, mock_read_json, mock_write_json):
-        # Mock setup
-        mock_read_json.return_value = {}
-        mock_write_json.return_value = None
+        self.assertEqual(failed_urls, [])
+        self.assertEqual(self.use_case.file_counter, Counter({"test": 2, "content": 2}))
+        mock_write_processed_urls.assert_called_once()
+
+    @patch('src.essays.usecases.essays.write_processed_urls', side_effect=OSError("disk full"))
+    async def test_fetch_and_filter_batch_parser_failure(self, mock_write_processed_urls):
+        # Every parser fails on its first flush, while the fetchers still have pages to queue
+        self.use_case.flush_interval = 1
+        self.use_case.max_concurrent_requests = 1
+        batch_urls = [f"https://test{i}.com" for i in range(20)]
+        mock_session = MagicMock()
+        mock_response = mock_session.get.return_value.__aenter__.return_value
+        mock_response.status = 200
+        mock_response.content = MagicMock()
+        mock_response.content.iter_chunked.return_value.__aiter__.return_value = [b"<html>test content</html>"]
+        processed_urls = {}
 
+        # Run the test, the failure is raised instead of leaving the fetchers blocked on the queue
+        with self.assertRaises(OSError):
+            await asyncio.wait_for(
+                self.use_case.fetch_and_filter_batch(batch_urls, {"test", "content"}, processed_urls, mock_session),
+                timeout=10
+            )
+
+        # Urls whose append failed are not dropped
+        self.assertTrue(processed_urls)
+
+    @patch('src.essays.usecases.essays.append_jsonl', side_effect=OSError("disk full"))
+    @patch('src.essays.usecases.essays.get_session', new_callable=AsyncMock)
+    async def test_execute_cancels_word_banks_download(self, mock_get_session, mock_append_jsonl):
+        download_cancelled = asyncio.Event()
+
+        async def slow_word_banks(use_case, session):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                download_cancelled.set()
+                raise
+
+        # Run the test, storing the urls fails while the word banks are still downloading
+        with patch.object(UploadEssaysFileUseCase, 'get_word_banks', slow_word_banks):
+            result = await self.use_case.execute()
+
+        self.assertEqual(result["status"], FileStatus.FAILED)
+        self.assertTrue(download_cancelled.is_set())
+
+    @patch.object(UploadEssaysFileUseCase, 'fetch_and_filter_batch', new_callable=AsyncMock, return_value=[])
+    @patch.object(UploadEssaysFileUseCase, 'get_word_banks', new_callable=AsyncMock,
+                  return_value=frozenset({"test", "content"}))
+    @patch('src.essays.usecases.essays.get_session', new_callable=AsyncMock)
+    async def test_execute(self, mock_get_session, mock_get_word_banks, mock_fetch_and_filter_batch):
         # Run the test
         result = await self.use_case.execute()
 
-        self.assertIsInstance(result, dict)
-        self.assertIn("failed_urls", result)
+        self.assertEqual(result["status"], FileStatus.PROCESSED)
+        self.assertEqual(result["failed_urls"], [])
         self.assertIn("file_id", result)
+        # Nothing is cached yet, so every url is fetched
+        self.assertEqual(sorted(mock_fetch_and_filter_batch.call_args.args[0]), self.test_urls)
 
 
-class TestGetMaxWordCountsFromEssays(unittest.TestCase):
+class TestFilterCachedUrls(unittest.TestCase):
+    def setUp(self):
+        patch_cache_folder(self)
+        self.use_case = UploadEssaysFileUseCase(["https://fresh.com", "https://stale.com", "https://new.com", ""],
+                                                "test_file.txt")
+        self.use_case.word_banks_hash = "current"
+        self.use_case.already_processed_urls = {
+            "https://fresh.com": {"wb": "current", "counts": {"test": 2}},
+            "https://stale.com": {"wb": "previous", "counts": {"content": 5}},
+            "https://other.com": {"wb": "current", "counts": {"other": 1}},
+        }
+
+    def test_filter_cached_urls(self):
+        filtered_urls = self.use_case.filter_cached_urls()
+
+        # Counts filtered with other word banks are fetched again, blank lines are skipped
+        self.assertEqual(sorted(filtered_urls), ["https://new.com", "https://stale.com"])
+        # Only the counts of the file's urls filtered with the current word banks are reused
+        self.assertEqual(self.use_case.file_counter, Counter({"test": 2}))
+
+
+class TestProcessedUrlsCache(unittest.TestCase):
+    def setUp(self):
+        patch_cache_folder(self)
+        self.cache_file = EssayConfiguration.PROCESSED_LINKS_JSONL_FILE_PATH
+
+    def test_torn_record_is_skipped(self):
+        write_processed_urls({"https://test1.com": {"test": 1}}, self.cache_file, "wb")
+        # An append interrupted halfway through its record
+        with open(self.cache_file, "ab") as file:
+            file.write(b'{"url":"https://torn.com","wb":"wb","cou')
+
+        # A reader sees the complete records only
+        self.assertEqual(read_processed_urls(self.cache_file),
+                         {"https://test1.com": {"wb": "wb", "counts": {"test": 1}}})
+
+        # The next append starts on a new line instead of joining onto the torn record
+        write_processed_urls({"https://test2.com": {"content": 2}}, self.cache_file, "wb")
+
+        self.assertEqual(read_processed_urls(self.cache_file), {
+            "https://test1.com": {"wb": "wb", "counts": {"test": 1}},
+            "https://test2.com": {"wb": "wb", "counts": {"content": 2}},
+        })
+
+
+class TestProcessPools(unittest.TestCase):
+    def tearDown(self):
+        shutdown_process_pool()
+
+    @patch('src.essays.usecases.essays.concurrent.futures.ProcessPoolExecutor')
+    def test_newer_word_bank_keeps_the_pool_in_use(self, mock_executor):
+        mock_executor.side_effect = lambda **kwargs: MagicMock()
+
+        with use_process_pool(frozenset({"old"})) as old_pool:
+            with use_process_pool(frozenset({"new"})) as new_pool:
+                # The batch of the older word bank is still running, its pool stays up
+                self.assertIsNot(old_pool, new_pool)
+                old_pool.shutdown.assert_not_called()
+            # The latest word bank keeps its pool for the next batch
+            new_pool.shutdown.assert_not_called()
+        # Nobody uses the older word bank anymore
+        old_pool.shutdown.assert_called_once()
+
+        # An equal word bank reuses the same pool
+        with use_process_pool(frozenset({"new"})) as pool:
+            self.assertIs(pool, new_pool)
+
+
+class TestGetMaxWordCountsFromEssays(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         self.test_urls = ["https://test1.com", "https://test2.com"]
         self.file_name = "test_file.txt"
         self.use_case = GetMaxWordCountsFromEssays(self.test_urls, self.file_name)
 
-    @patch('src.usecases.essays.UploadEssaysFileUseCase')
+    @patch('src.essays.usecases.essays.UploadEssaysFileUseCase')
     async def test_execute(self, mock_upload_use_case):
         # Mock setup
+        mock_upload_use_case.return_value.execute = AsyncMock()
         mock_upload_use_case.return_value.execute.return_value = {
             "failed_urls": [],
-            "file_id": "test_file_id"
+            "file_id": "test_file_id",
+            "status": FileStatus.PROCESSED,
+            "aggregate": Counter({"test": 2, "content": 1})
         }
 
         # Run the test
         result = await self.use_case.execute()
 
-        self.assertIsInstance(result, dict)
-        self.assertIn("top_words", result)
-        self.assertIn("failed_urls", result)
-        self.assertIn("file_id", result)
+        self.assertEqual(result, {
+            "top_words": {"test": 2, "content": 1},
+            "failed_urls": [],
+            "file_id": "test_file_id"
+        })
 
 
 class TestGetMaxCountsBasedOnID(unittest.TestCase):
@@ -156,5 +477,42 @@ class TestGetMaxCountsBasedOnID(unittest.TestCase):
         self.assertIn("content", result)
 
 
+class TestLegacyFileRecords(unittest.TestCase):
+    def setUp(self):
+        patch_cache_folder(self)
+        # A file processed before the aggregate and the JSON lines cache existed
+        write_to_json({"legacy_id": {"file_name": "old.txt", "status": FileStatus.PROCESSED,
+                                     "http_urls": ["https://test1.com", "https://test2.com"], "failed_urls": []}},
+                      EssayConfiguration.PROCESSED_FILES_JSON_FILE_PATH)
+        write_to_json({"https://test1.com": {"test": 2, "content": 1},
+                       "https://test2.com": {"test": 1},
+                       "https://other.com": {"other": 9}},
+                      EssayConfiguration.LEGACY_PROCESSED_LINKS_JSON_FILE_PATH)
+
+    def test_execute_reads_legacy_counts(self):
+        result = GetMaxCountsBasedOnID(file_id="legacy_id", top_words=2).execute()
+
+        self.assertEqual(result, {"top_words": {"test": 3, "content": 1}, "failed_urls": [], "file_id": "legacy_id"})
+
+
+class TestAggregateWordCounts(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            "https://test1.com": {"test": 2, "content": 1},
+            "https://test2.com": {"test": 1},
+            "https://test3.com": {"other": 5}
+        }
+
+    def test_aggregate_word_counts_from_cached_side(self):
+        result = GetMaxCountsBasedOnID.aggregate_word_counts(self.data, ["https://test1.com", "https://test2.com"])
+
+        self.assertEqual(dict(result), {"test": 3, "content": 1})
+
+    def test_aggregate_word_counts_from_url_side(self):
+        result = GetMaxCountsBasedOnID.aggregate_word_counts(self.data, ["https://test1.com"])
+
+        self.assertEqual(dict(result), {"test": 2, "content": 1})
+
+
 if __name__ == '__main__':
     unittest.main()